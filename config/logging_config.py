@@ -1,7 +1,85 @@
+import atexit
+import glob
+import heapq
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
 import os
+import queue
+import threading
+import types
+
+
+def _fast_should_rollover(self, record):
+    """
+    Versión de RotatingFileHandler.shouldRollover que comprueba primero el
+    tamaño del fichero y solo consulta el sistema de ficheros cuando hay que rotar.
+    """
+    if self.stream is None:
+        self.stream = self._open()
+    if self.maxBytes > 0:
+        msg = "%s\n" % self.format(record)
+        self.stream.seek(0, 2)
+        if self.stream.tell() + len(msg) < self.maxBytes:
+            return False
+        # Ficheros especiales (p.ej. /dev/null) nunca se rotan
+        if os.path.exists(self.baseFilename) and not os.path.isfile(self.baseFilename):
+            return False
+        return True
+    return False
+
+
+class _TimedMemoryHandler(MemoryHandler):
+    """
+    MemoryHandler para un RotatingFileHandler que, además de vaciarse al llenarse
+    o al recibir un error, vuelca el buffer periódicamente desde un hilo en segundo plano.
+
+    Cada volcado escribe todos los registros acumulados con una sola escritura y un
+    solo flush del fichero. El tamaño del fichero se lleva en memoria, de modo que
+    la comprobación de rotación se hace una vez por bloque y no por registro.
+    """
+    def __init__(self, capacity, flushLevel, target, flushOnClose=True, flush_interval=1.0):
+        super().__init__(capacity, flushLevel=flushLevel, target=target, flushOnClose=flushOnClose)
+        self._size = os.path.getsize(target.baseFilename) if os.path.exists(target.baseFilename) else 0
+        self.flush_interval = flush_interval
+        self._stop_event = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+
+    def _flush_periodically(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            records, self.buffer = self.buffer, []
+            target = self.target
+            if not records or target is None:
+                return
+            records = [r for r in records if r.levelno >= target.level and target.filter(r)]
+            if not records:
+                return
+            target.acquire()
+            try:
+                text = "".join([target.format(record) + target.terminator for record in records])
+                if target.stream is None:
+                    target.stream = target._open()
+                # Rota antes de escribir si el bloque no cabe en el fichero actual
+                if target.maxBytes > 0 and self._size > 0 and self._size + len(text) >= target.maxBytes:
+                    target.doRollover()
+                    self._size = 0
+                target.stream.write(text)
+                target.stream.flush()
+                self._size += len(text)
+            except Exception:
+                target.handleError(records[-1])
+            finally:
+                target.release()
+
+    def close(self):
+        self._stop_event.set()
+        super().close()
+
 
 class LoggerManager:
     def __init__(self, log_directory='logs', max_bytes=5 * 1024 * 1024, backup_count=3):
@@ -15,6 +93,7 @@ class LoggerManager:
         self.log_directory = log_directory
         self.max_bytes = max_bytes
         self.backup_count = backup_count
+        self.listener = None
         self.logger = self._configure_logging()
         current_date = datetime.now().strftime("%d-%m-%Y")
         self._cleanup_old_logs(current_date)
@@ -37,6 +116,10 @@ class LoggerManager:
         logger = logging.getLogger()  
         logger.setLevel(logging.DEBUG)  # Nivel global de logging
 
+        # Evita crear y agregar handlers de nuevo en caso de múltiples llamadas
+        if logger.handlers:
+            return logger
+
         # Formato de los logs
         log_format = '%(asctime)s - %(levelname)s - %(message)s'
         formatter = logging.Formatter(log_format)
@@ -52,11 +135,20 @@ class LoggerManager:
         )
         file_handler.setFormatter(formatter)
         file_handler.setLevel(logging.DEBUG)
+        file_handler.shouldRollover = types.MethodType(_fast_should_rollover, file_handler)
 
-        # Agregar los handlers al logger
-        if not logger.handlers:  # Evita agregar múltiples handlers en caso de múltiples llamadas
-            logger.addHandler(console_handler)
-            logger.addHandler(file_handler)
+        # Agrupa las escrituras a fichero: se vuelcan cada 500 registros, cada segundo o ante un error
+        buffered_file_handler = _TimedMemoryHandler(
+            capacity=500, flushLevel=logging.ERROR, target=file_handler, flushOnClose=True
+        )
+        buffered_file_handler.setLevel(logging.DEBUG)
+
+        # Los registros se encolan y un hilo en segundo plano los escribe en consola y fichero
+        log_queue = queue.Queue(-1)
+        logger.addHandler(QueueHandler(log_queue))
+        self.listener = QueueListener(log_queue, console_handler, buffered_file_handler, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.listener.stop)
 
         return logger
     
@@ -66,16 +158,14 @@ class LoggerManager:
 
         :param current_date: Fecha actual en formato dd-MM-yyyy.
         """
-        log_files = [
-            f for f in os.listdir(self.log_directory)
-            if f.startswith(f'app_{current_date}') and f.endswith('.log')
-        ]
-        log_files.sort()  # Ordena los archivos para garantizar que los más antiguos sean los primeros
-
-        # Si hay más de `backup_count` logs, elimina los más antiguos
-        while len(log_files) > self.backup_count:
-            file_to_remove = log_files.pop(0)
-            os.remove(os.path.join(self.log_directory, file_to_remove))
+        pattern = os.path.join(glob.escape(self.log_directory), f'app_{current_date}*.log')
+        log_files = glob.glob(pattern)
+
+        # Si hay más de `backup_count` logs, elimina los más antiguos (primeros en orden alfabético)
+        excess = len(log_files) - self.backup_count
+        if excess > 0:
+            for file_to_remove in heapq.nsmallest(excess, log_files):
+                os.unlink(file_to_remove)
 
     def get_logger(self):
         """
@@ -1,15 +1,212 @@
+import asyncio
+import gzip
 import logging
-from logging.handlers import TimedRotatingFileHandler
-import requests
-from datetime import datetime, timedelta, timezone
-import json
+import os
+import sqlite3
+import sys
+import time
+import httpx
+from datetime import datetime, timedelta
+import orjson
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+_MS_PER_DAY = 86_400_000
+_CACHE_EXPIRE_AFTER = timedelta(days=7)
+# Por debajo de este tamaño comprimir el mensaje no compensa
+_GZIP_MIN_BYTES = 1024
+
+# Plantillas constantes de las tarjetas de Google Chat, construidas una sola vez
+_HEADER_ERROR = {
+    "title": "<b> ¡Algo ha salido mal! </b>",
+    "imageUrl": "https://png.pngtree.com/png-vector/20230904/ourmid/pngtree-fail-stamp-grungy-png-image_9932568.png"
+}
+_HEADER_NO_ERRORS = {
+    "title": "<b> Informe de alertas </b>",
+    "imageUrl": "https://cdn-icons-png.freepik.com/256/16206/16206597.png?semt=ais_hybrid"
+}
+_HEADER_REPORT = {
+    "title": "<b> Informe de alertas </b>",
+    "imageUrl": "https://cdn-icons-png.flaticon.com/512/559/559384.png"
+}
+_NO_EVENTS_WIDGET = {
+    "textParagraph": {
+        "text": "No se encontraron eventos para este batch."
+    }
+}
+
+
+def _query_window(days_back):
+    """Devuelve el intervalo (inicio, fin) en milisegundos epoch de los últimos `days_back` días."""
+    now_ms = time.time_ns() // 1_000_000
+    return now_ms - int(days_back * _MS_PER_DAY), now_ms
+
+
+def _create_client(max_concurrency):
+    """Crea el cliente HTTP/2 asíncrono utilizado para todas las peticiones."""
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    return httpx.AsyncClient(http2=True, limits=limits, timeout=30)
+
+
+def _is_transient_error(exc):
+    """Indica si un error HTTP merece reintento (429, 5xx o fallo de transporte)."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+# Reintenta las peticiones a AEP ante limitación de tasa o errores transitorios
+_retry_transient = retry(
+    retry=retry_if_exception(_is_transient_error),
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(),
+    reraise=True
+)
+
+
+def _event_type_widget(record):
+    """Widget con el tipo de evento de un registro."""
+    return {"textParagraph": {"text": f"<b>&nbsp;&nbsp;• Tipo de evento:</b> {record['eventType']}\n\n<br>"}}
+
+
+def _event_source_widget(record):
+    """Widget con la página de origen de un registro."""
+    return {
+        "keyValue": {
+            "topLabel": "<b>Página de origen del evento</b>",
+            "content": record['webPageURL'],
+            "contentMultiline": True
+        }
+    }
+
+
+def _build_card(header, subtitle, sections):
+    """Compone una tarjeta a partir de una cabecera constante y sus secciones."""
+    return {"cards": [{"header": {**header, "subtitle": subtitle}, "sections": sections}]}
+
+
+def _extract_hrefs(items):
+    """Devuelve los enlaces `_links.self.href` de un listado de ficheros de batch."""
+    hrefs = []
+    _append = hrefs.append
+    for item in items:
+        try:
+            href = item["_links"]["self"]["href"]
+        except (KeyError, TypeError):
+            continue
+        if href:
+            _append(href)
+    return hrefs
+
+
+def _project_event(data):
+    """Extrae el tipo de evento y la URL de origen de un registro de evento."""
+    try:
+        xdm_entity = data["body"]["xdmEntity"]
+    except (KeyError, TypeError):
+        return {"eventType": "No disponible", "webPageURL": "No disponible"}
+    try:
+        event_type = xdm_entity["eventType"]
+    except (KeyError, TypeError):
+        event_type = "No disponible"
+    try:
+        webpage_url = xdm_entity["web"]["webPageDetails"]["URL"]
+    except (KeyError, TypeError):
+        webpage_url = "No disponible"
+    return {"eventType": event_type, "webPageURL": webpage_url}
+
+
+def _project_event_lines(lines, append):
+    """
+    Decodifica líneas NDJSON en bytes y añade la proyección de cada evento con `append`.
+    Devuelve el número de líneas que no son JSON válido.
+    """
+    loads = orjson.loads
+    project = _project_event
+    decode_errors = 0
+    for line in lines:
+        if not line or line == b"\r":
+            continue
+        try:
+            append(project(loads(line)))
+        except orjson.JSONDecodeError:
+            decode_errors += 1
+            append({
+                "eventType": "Error de unión",
+                "webPageURL": "No disponible"
+            })
+    return decode_errors
+
+
+class EventCache:
+    """
+    Caché persistente en SQLite de los eventos extraídos de cada fichero de batch fallido.
+
+    Los ficheros de eventos de AEP son inmutables una vez creados, por lo que los
+    registros procesados se guardan indexados por su URL y se reutilizan en las
+    siguientes ejecuciones hasta que caducan.
+    """
+    # Límite conservador de parámetros por consulta en SQLite
+    _CHUNK_SIZE = 500
+
+    def __init__(self, path="http_cache.sqlite", expire_after=timedelta(days=7)):
+        """
+        Abre (o crea) la caché en disco y elimina las entradas caducadas.
+
+        :param path: Ruta del fichero SQLite.
+        :param expire_after: Tiempo durante el que una entrada se considera válida.
+        """
+        self.path = path
+        self.expire_after = expire_after
+        self._connection = sqlite3.connect(path)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "url TEXT PRIMARY KEY, records BLOB NOT NULL, created REAL NOT NULL)"
+            )
+        self.delete_expired()
+
+    def get_many(self, urls):
+        """Devuelve un diccionario URL -> registros con las entradas vigentes encontradas."""
+        min_created = time.time() - self.expire_after.total_seconds()
+        cached = {}
+        for i in range(0, len(urls), self._CHUNK_SIZE):
+            chunk = urls[i:i + self._CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._connection.execute(
+                f"SELECT url, records FROM events WHERE created >= ? AND url IN ({placeholders})",
+                (min_created, *chunk)
+            )
+            cached.update((url, orjson.loads(records)) for url, records in rows)
+        return cached
+
+    def set_many(self, entries):
+        """Guarda los registros de cada URL del diccionario `entries`."""
+        now = time.time()
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO events (url, records, created) VALUES (?, ?, ?)",
+                ((url, orjson.dumps(records), now) for url, records in entries.items())
+            )
+
+    def delete_expired(self):
+        """Elimina las entradas caducadas."""
+        min_created = time.time() - self.expire_after.total_seconds()
+        with self._connection:
+            self._connection.execute("DELETE FROM events WHERE created < ?", (min_created,))
+
+    def close(self):
+        """Cierra la conexión con la base de datos."""
+        self._connection.close()
+
 
 class BatchProcessor:
-     """
+    """
     Clase para gestionar la obtención y procesamiento de batches fallidos, 
     además de notificar los resultados a Google Chat.
     """
-    def __init__(self, base_url, dataset_id, headers, webhook_url, log_file="script_log.log", days_back=1):
+    def __init__(self, base_url, dataset_id, headers, webhook_url, *, days_back=1,
+                 cache_file="http_cache.sqlite", max_concurrency=16, logger=None,
+                 client=None, event_cache=None, semaphore=None):
         """
         Inicializa la clase con los parámetros básicos.
         
@@ -17,271 +214,303 @@ class BatchProcessor:
         :param dataset_id: Identificador del dataset que se está procesando.
         :param headers: Encabezados para las solicitudes HTTP.
         :param webhook_url: URL del webhook de Google Chat para enviar notificaciones.
+        :param cache_file: Fichero SQLite donde se guardan los eventos ya descargados.
+        :param max_concurrency: Número máximo de peticiones simultáneas a la API.
+        :param logger: Logger a utilizar; por defecto, el logger del módulo.
+        :param client: Cliente httpx compartido; si no se indica, se crea uno por ejecución.
+        :param event_cache: EventCache compartida; si no se indica, se abre `cache_file` en cada ejecución.
+        :param semaphore: Semáforo compartido que limita las peticiones simultáneas.
         """
         self.base_url = base_url
         self.dataset_id = dataset_id
         self.headers = headers
         self.webhook_url = webhook_url
         self.days_back = days_back
+        self.max_concurrency = max_concurrency
+        self.client = client
+        self.cache_file = cache_file
+        self.event_cache = event_cache
+        self._semaphore = semaphore or asyncio.Semaphore(max_concurrency)
 
-        # Configuración de logging
-        logging.basicConfig(
-            level=logging.DEBUG,
-            format="%(asctime)s - %(levelname)s - %(message)s",
-            handlers=[
-                TimedRotatingFileHandler(
-                    log_file,
-                    when="W0",  # Rotar semanalmente, cada lunes
-                    interval=1,
-                    backupCount=4
-                ),
-                logging.StreamHandler()
-            ]
-        )
-        self.logger = logging.getLogger(__name__)
+        # La configuración de handlers corresponde a LoggerManager
+        self.logger = logger or logging.getLogger(__name__)
+
+    async def get_failed_batches_data(self, client, window=None):
+        """
+        Obtiene y procesa los batches fallidos.
 
-    def get_failed_batches_data(self):
-        """Obtiene y procesa los batches fallidos."""
-        self.logger.info(f"Iniciando obtención de batches fallidos para dataset_id: {self.dataset_id}")
-        now = datetime.now(timezone.utc)
-        start_date = now - timedelta(days=self.days_back)
+        :param window: Intervalo (inicio, fin) en milisegundos epoch; si no se indica,
+            se calculan los últimos `days_back` días. Permite reutilizar el mismo
+            intervalo al procesar varios datasets.
+        """
+        self.logger.info("Iniciando obtención de batches fallidos para dataset_id: %s", self.dataset_id)
+        created_after, created_before = window or _query_window(self.days_back)
         params = {
             "dataSet": self.dataset_id,
-            "createdAfter": int(start_date.timestamp() * 1000),
-            "createdBefore": int(now.timestamp() * 1000),
+            "createdAfter": created_after,
+            "createdBefore": created_before,
             "status": "failed",
             "orderBy": "asc:created"
         }
 
         try:
-            self.logger.debug(f"Realizando llamada a {self.base_url} con params: {params}")
-            response = requests.get(self.base_url, params=params, headers=self.headers)
-            response.raise_for_status()
-            failed_batches = response.json()
-            self.logger.info(f"Se obtuvieron {len(failed_batches)} batches fallidos.")
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Error al obtener batches fallidos: {e}")
+            self.logger.debug("Realizando llamada a %s con params: %s", self.base_url, params)
+            failed_batches = await self._fetch_failed_batches(client, params)
+            self.logger.info("Se obtuvieron %d batches fallidos.", len(failed_batches))
+        except (httpx.HTTPError, orjson.JSONDecodeError) as e:
+            self.logger.error("Error al obtener batches fallidos: %s", e)
             return None, None, f"<b>Error HTTP:</b>\n\n {str(e)}"
 
         if not failed_batches:
             self.logger.info("No se encontraron batches fallidos.")
             return None, None, None
 
-        return self._process_failed_batches(failed_batches)
+        return await self._process_failed_batches(client, failed_batches)
+
+    @_retry_transient
+    async def _fetch_failed_batches(self, client, params):
+        """Descarga el listado de batches fallidos."""
+        async with self._semaphore:
+            response = await client.get(self.base_url, params=params, headers=self.headers)
+            response.raise_for_status()
+            return orjson.loads(response.content)
+
+    @_retry_transient
+    async def _fetch_failed_batch_location(self, client, failed_batch_location):
+        """Descarga el listado de ficheros de un batch fallido."""
+        self.logger.debug("Procesando ubicación de batch fallido: %s", failed_batch_location)
+        async with self._semaphore:
+            response = await client.get(failed_batch_location, headers=self.headers)
+            response.raise_for_status()
+            return orjson.loads(response.content)
+
+    @_retry_transient
+    async def _fetch_event_data(self, client, url):
+        """
+        Descarga un fichero de eventos NDJSON y lo procesa por bloques
+        según llega, sin cargar el cuerpo completo en memoria.
+        """
+        self.logger.debug("Solicitando datos de evento desde %s", url)
+        records = []
+        decode_errors = 0
+        # Línea incompleta arrastrada entre bloques; solo se divide cada bloque nuevo
+        pending = bytearray()
+        async with self._semaphore, client.stream("GET", url, headers=self.headers) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                lines = chunk.split(b"\n")
+                if len(lines) == 1:
+                    pending += chunk
+                    continue
+                pending += lines[0]
+                lines[0] = pending
+                pending = bytearray(lines.pop())
+                decode_errors += _project_event_lines(lines, records.append)
+        if pending:
+            decode_errors += _project_event_lines((pending,), records.append)
+        if decode_errors:
+            self.logger.warning("Error de decodificación JSON en la URL %s (%d líneas)", url, decode_errors)
+        return records
+
+    async def _process_failed_batches(self, client, failed_batches):
+        locations = {
+            batch_id: batch_info.get("failedBatchLocation")
+            for batch_id, batch_info in failed_batches.items()
+            if batch_info.get("failedBatchLocation")
+        }
+        # Varios batches pueden compartir ubicación o ficheros de eventos: cada URL se descarga una sola vez
+        unique_locations = list(dict.fromkeys(locations.values()))
+        results = await asyncio.gather(
+            *(self._fetch_failed_batch_location(client, location) for location in unique_locations),
+            return_exceptions=True
+        )
+        location_data = dict(zip(unique_locations, results))
 
-    def _process_failed_batches(self, failed_batches):
         failed_urls = {}
-        for batch_id, batch_info in failed_batches.items():
-            failed_batch_location = batch_info.get("failedBatchLocation")
-            if failed_batch_location:
-                try:
-                    self.logger.debug(f"Procesando ubicación de batch fallido: {failed_batch_location}")
-                    response = requests.get(failed_batch_location, headers=self.headers)
-                    response.raise_for_status()
-                    data = response.json()
-                    failed_urls[batch_id] = [
-                        item.get("_links", {}).get("self", {}).get("href")
-                        for item in data.get("data", [])
-                        if item.get("_links", {}).get("self", {}).get("href")
-                    ]
-                except requests.RequestException as e:
-                    self.logger.error(f"Error al procesar {failed_batch_location}: {e}")
+        for batch_id, failed_batch_location in locations.items():
+            data = location_data[failed_batch_location]
+            if isinstance(data, Exception):
+                self.logger.error("Error al procesar %s: %s", failed_batch_location, data)
+                continue
+            failed_urls[batch_id] = _extract_hrefs(data.get("data", []))
+
+        unique_urls = list(dict.fromkeys(url for urls in failed_urls.values() for url in urls))
+        # Los ficheros de eventos son inmutables: solo se descargan los que no están en caché
+        event_data = self.event_cache.get_many(unique_urls)
+        pending_urls = [url for url in unique_urls if url not in event_data]
+        self.logger.debug("Eventos en caché: %d, pendientes de descarga: %d", len(event_data), len(pending_urls))
+        results = await asyncio.gather(
+            *(self._fetch_event_data(client, url) for url in pending_urls),
+            return_exceptions=True
+        )
+        fetched = dict(zip(pending_urls, results))
+        for url, records in fetched.items():
+            if isinstance(records, Exception):
+                self.logger.error("Error al procesar la URL %s: %s", url, records)
+        self.event_cache.set_many({
+            url: records for url, records in fetched.items() if not isinstance(records, Exception)
+        })
+        event_data.update(fetched)
 
         batch_data_map = {}
         for batch_id, urls in failed_urls.items():
             batch_data_map[batch_id] = []
             for url in urls:
-                try:
-                    self.logger.debug(f"Solicitando datos de evento desde {url}")
-                    response = requests.get(url, headers=self.headers)
-                    response.raise_for_status()
-                    json_objects = response.text.splitlines()
-                    for json_obj in json_objects:
-                        try:
-                            data = json.loads(json_obj)
-                            xdm_entity = data.get("body", {}).get("xdmEntity", {})
-                            event_type = xdm_entity.get("eventType", "No disponible")
-                            webpage_url = xdm_entity.get("web", {}).get("webPageDetails", {}).get("URL", "No disponible")
-                            batch_data_map[batch_id].append({
-                                "eventType": event_type,
-                                "webPageURL": webpage_url
-                            })
-                        except json.JSONDecodeError:
-                            self.logger.warning(f"Error de decodificación JSON en la URL {url}")
-                            batch_data_map[batch_id].append({
-                                "eventType": "Error de unión",
-                                "webPageURL": "No disponible"
-                            })
-                except requests.RequestException as e:
-                    self.logger.error(f"Error al procesar la URL {url}: {e}")
+                records = event_data[url]
+                if isinstance(records, Exception):
                     batch_data_map[batch_id].append({
                         "eventType": "Error",
                         "webPageURL": "Error"
                     })
+                else:
+                    batch_data_map[batch_id].extend(records)
 
         self.logger.info("Procesamiento de batches fallidos completado.")
         return failed_batches, batch_data_map, None
 
-    def build_card_message(failed_batches, processed_batches, days_back, dataset_id, error_message=None):
+    def build_card_message(self, failed_batches, processed_batches, days_back, dataset_id, error_message=None):
         """Construye el mensaje en formato JSON para Google Chat."""
+        subtitle = f"Enviado: <b>{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</b>"
 
         if error_message:
-            return {
-                "cards": [
-                    {
-                        "header": {
-                            "title": "<b> ¡Algo ha salido mal! </b>",
-                            "subtitle": f"Enviado: <b>{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</b>",
-                            "imageUrl": "https://png.pngtree.com/png-vector/20230904/ourmid/pngtree-fail-stamp-grungy-png-image_9932568.png"
-                        },
-                        "sections": [
-                            {
-                                "widgets": [
-                                    {
-                                        "textParagraph": {
-                                            "text": error_message
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                ]
-            }
+            return _build_card(_HEADER_ERROR, subtitle, [
+                {"widgets": [{"textParagraph": {"text": error_message}}]}
+            ])
 
         if not failed_batches:
-            return {
-                "cards": [
-                    {
-                        "header": {
-                            "title": "<b> Informe de alertas </b>",
-                            "subtitle": f"Enviado: <b>{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</b>",
-                            "imageUrl": "https://cdn-icons-png.freepik.com/256/16206/16206597.png?semt=ais_hybrid"
-                        },
-                        "sections": [
-                            {
-                                "widgets": [
-                                    {
-                                        "textParagraph": {
-                                            "text": f"No se encontraron errores en las últimas <b>{int(days_back * 24)}</b> horas.\n\n"
-                                            f"<b>Dataset ID:</b> {dataset_id}"
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                ]
-            }
-
-        card_message = {
-            "cards": [
-                {
-                    "header": {
-                        "title": "<b> Informe de alertas </b>",
-                        "subtitle": f"Enviado: <b>{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</b>",
-                        "imageUrl": "https://cdn-icons-png.flaticon.com/512/559/559384.png"
-                    },
-                    "sections": [
-                        {
-                            "widgets": [
-                                {
-                                    "textParagraph": {
-                                        "text": f"Se han consultado las últimas <b>{int(days_back * 24)}</b> horas. \nNúmero total de errores: <b>{len(failed_batches)}</b>"
-                                    }
-                                }
-                            ]
-                        }
-                    ]
-                }
-            ]
-        }
+            return _build_card(_HEADER_NO_ERRORS, subtitle, [
+                {"widgets": [{"textParagraph": {
+                    "text": f"No se encontraron errores en las últimas <b>{int(days_back * 24)}</b> horas.\n\n"
+                    f"<b>Dataset ID:</b> {dataset_id}"
+                }}]}
+            ])
+
+        card_message = _build_card(_HEADER_REPORT, subtitle, [
+            {"widgets": [{"textParagraph": {
+                "text": f"Se han consultado las últimas <b>{int(days_back * 24)}</b> horas. \nNúmero total de errores: <b>{len(failed_batches)}</b>"
+            }}]}
+        ])
+        sections = card_message["cards"][0]["sections"]
 
         for batch_id, batch_info in failed_batches.items():
             related_objects = batch_info.get("relatedObjects", [])
             errors = batch_info.get("errors", [])
-            tags = batch_info.get("tags", [])
+            tags = batch_info.get("tags", {})
 
-            dataset_id = related_objects[0].get("id") if related_objects else "No disponible"
+            batch_dataset_id = related_objects[0].get("id") if related_objects else "No disponible"
             error_code = errors[0].get("code") if errors else "No disponible"
             error_description = errors[0].get("description") if errors else "No disponible"
             flow_id = tags.get("flowId", ["No disponible"])[0]
 
-            batch_details = (
-                f"<b>Batch ID:</b> {batch_id}<br>\n"
-                f"<b>&nbsp;&nbsp;• Dataflow:</b> {flow_id}<br>"
-                f"<b>&nbsp;&nbsp;• Dataset ID:</b> {dataset_id}<br>"
-                f"<b>&nbsp;&nbsp;• Código de error:</b> {error_code}<br>"
-                f"<b>&nbsp;&nbsp;• Descripción:</b> {error_description}<br>"
-            )
+            batch_details = "".join((
+                "<b>Batch ID:</b> ", str(batch_id), "<br>\n",
+                "<b>&nbsp;&nbsp;• Dataflow:</b> ", str(flow_id), "<br>",
+                "<b>&nbsp;&nbsp;• Dataset ID:</b> ", str(batch_dataset_id), "<br>",
+                "<b>&nbsp;&nbsp;• Código de error:</b> ", str(error_code), "<br>",
+                "<b>&nbsp;&nbsp;• Descripción:</b> ", str(error_description), "<br>",
+            ))
 
-            section = {
-                "widgets": [
-                    {
-                        "textParagraph": {
-                            "text": batch_details
-                        }
-                    }
-                ]
-            }
+            details_widget = {"textParagraph": {"text": batch_details}}
 
             if batch_id in processed_batches:
-                for record in processed_batches[batch_id]:
-                    event_details = (
-                        f"<b>&nbsp;&nbsp;• Tipo de evento:</b> {record['eventType']}\n\n<br>"
-                    )
-                    section["widgets"].append({
-                        "textParagraph": {
-                            "text": event_details
-                        }
-                    })
-                    section["widgets"].append({
-                        "keyValue": {
-                            "topLabel": "<b>Página de origen del evento</b>",
-                            "content": record['webPageURL'],
-                            "contentMultiline": True
-                        }
-                    })
+                widgets = [details_widget]
+                widgets += [
+                    widget
+                    for record in processed_batches[batch_id]
+                    for widget in (_event_type_widget(record), _event_source_widget(record))
+                ]
             else:
-                section["widgets"].append({
-                    "textParagraph": {
-                        "text": "No se encontraron eventos para este batch."
-                    }
-                })
+                widgets = [details_widget, _NO_EVENTS_WIDGET]
 
-            card_message["cards"][0]["sections"].append(section)
+            sections.append({"widgets": widgets})
 
         return card_message
 
-    def post_message_to_google_chat(self, card_message):
+    async def post_message_to_google_chat(self, client, card_message):
         """Envía el mensaje a Google Chat utilizando un webhook."""
         if card_message is None or not card_message.get("cards"):
             self.logger.error("El mensaje está vacío y no se enviará.")
             return
 
-        response = requests.post(self.webhook_url, json=card_message, headers={"Content-Type": "application/json"})
+        body = orjson.dumps(card_message)
+        headers = {"Content-Type": "application/json"}
+        if len(body) >= _GZIP_MIN_BYTES:
+            body = gzip.compress(body, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+
+        response = await client.post(self.webhook_url, content=body, headers=headers)
         if response.status_code != 200:
-            self.logger.error(f"Error al enviar el mensaje. Código de respuesta: {response.status_code}")
+            self.logger.error("Error al enviar el mensaje. Código de respuesta: %s", response.status_code)
             self.logger.error(response.text)
         else:
             self.logger.info("Mensaje enviado exitosamente a Google Chat.")
 
-    def process_and_notify(self):
+    async def process_and_notify(self, window=None):
         """Función principal para buscar batches fallidos y enviar el mensaje a Google Chat."""
-        failed_batches, processed_batches, error_message = self.get_failed_batches_data()
-        card_message = self.build_card_message(failed_batches, processed_batches, error_message)
-        self.post_message_to_google_chat(card_message)
+        owns_cache = self.event_cache is None
+        if owns_cache:
+            self.event_cache = EventCache(self.cache_file, expire_after=_CACHE_EXPIRE_AFTER)
+        try:
+            if self.client is not None:
+                await self._process_and_notify(self.client, window)
+                return
+            async with _create_client(self.max_concurrency) as client:
+                await self._process_and_notify(client, window)
+        finally:
+            if owns_cache:
+                self.event_cache.close()
+                self.event_cache = None
+
+    async def _process_and_notify(self, client, window):
+        failed_batches, processed_batches, error_message = await self.get_failed_batches_data(client, window)
+        card_message = self.build_card_message(
+            failed_batches, processed_batches, self.days_back, self.dataset_id, error_message
+        )
+        await self.post_message_to_google_chat(client, card_message)
+
 
+async def _process_dataset(processor, window):
+    """Procesa un dataset registrando sus errores para que no cancelen al resto."""
+    try:
+        await processor.process_and_notify(window)
+    except Exception:
+        processor.logger.exception("Error al procesar el dataset %s", processor.dataset_id)
+
+
+async def run_all(base_url, dataset_ids, headers, webhook_url, *, days_back=1,
+                  cache_file="http_cache.sqlite", max_concurrency=16, logger=None):
+    """
+    Procesa varios datasets de forma concurrente compartiendo el cliente HTTP,
+    el límite de concurrencia, la caché de eventos y el intervalo de consulta.
+    """
+    event_cache = EventCache(cache_file, expire_after=_CACHE_EXPIRE_AFTER)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    window = _query_window(days_back)
+    try:
+        async with _create_client(max_concurrency) as client, asyncio.TaskGroup() as tg:
+            for dataset_id in dataset_ids:
+                processor = BatchProcessor(
+                    base_url, dataset_id, headers, webhook_url, days_back=days_back,
+                    max_concurrency=max_concurrency, logger=logger,
+                    client=client, event_cache=event_cache, semaphore=semaphore
+                )
+                tg.create_task(_process_dataset(processor, window))
+    finally:
+        event_cache.close()
 
 
 if __name__ == "__main__":
-    processor = BatchProcessor(
+    # config/ está en la raíz del repositorio, fuera de src/
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from config.logging_config import LoggerManager
+
+    asyncio.run(run_all(
         base_url="https://example.com/api",
-        dataset_id="dataset123",
+        dataset_ids=["dataset123"],
         headers={"Authorization": "Bearer token"},
         webhook_url="https://chat.googleapis.com/v1/spaces/...",
-        days_back=1
-    )
-    processor.process_and_notify()
+        days_back=1,
+        logger=LoggerManager().get_logger()
+    ))
 
 